@@ -1,32 +1,62 @@
 # cli.py
 import argparse
-import asyncio
-from KatamariSDK.KatamariDB import KatamariORM, KatamariMVCC
-from KatamariSDK.KatamariPipelines import PipelineManager
-from KatamariSDK.KatamariAggregation import KatamariAggregation as KatamariAggregate
-from KatamariSDK.KatamariIAM import KatamariIAM
-from KatamariSDK.KatamariLambda import KatamariLambdaFunction
+import importlib
+
+# Heavy SDK modules are imported only for the command being run:
+# command -> (module, attribute)
+_LAZY = {
+    "query": ("KatamariSDK.KatamariDB", "KatamariORM"),
+    "pipeline": ("KatamariSDK.KatamariPipelines", "PipelineManager"),
+    "aggregate": ("KatamariSDK.KatamariAggregation", "KatamariAggregation"),
+    "auth": ("KatamariSDK.KatamariIAM", "KatamariIAM"),
+    "lambda": ("KatamariSDK.KatamariLambda", "KatamariLambdaFunction"),
+}
+
+def _load(command):
+    """Import and return the SDK class backing a CLI command."""
+    module_name, attribute = _LAZY[command]
+    return getattr(importlib.import_module(module_name), attribute)
 
 # Define async wrapper for running async commands from the CLI
 def async_command(command):
-    asyncio.run(command)
+    """Run a coroutine to completion, on uvloop when it is installed.
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Katamari CLI - Command-line interface for managing the Katamari ecosystem"
-    )
-    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+    Every command is I/O-bound, so libuv's cheaper scheduling helps most where
+    many awaits are in flight, e.g. KatamariFailover.failover_to_provider
+    waiting on several providers to provision.
+    """
+    import asyncio
+    try:
+        import uvloop
+    except ImportError:  # uvloop is optional and not available on Windows
+        asyncio.run(command)
+        return
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+        runner.run(command)
 
-    # Command: katamari-cli query
-    query_parser = subparsers.add_parser("query", help="Run a database query")
+# Command: katamari-cli query
+def p_query(query_parser):
     query_parser.add_argument("query", type=str, help="Query to run on KatamariDB")
 
-    # Command: katamari-cli pipeline
-    pipeline_parser = subparsers.add_parser("pipeline", help="Manage pipelines")
+def run_query(args):
+    KatamariORM = _load("query")
+    async_command(KatamariORM.search(args.query))
+
+# Command: katamari-cli pipeline
+def p_pipeline(pipeline_parser):
     pipeline_parser.add_argument("action", choices=["start", "stop", "list"], help="Pipeline action")
 
-    # Command: katamari-cli aggregate
-    aggregate_parser = subparsers.add_parser("aggregate", help="Run data aggregation")
+def run_pipeline(args):
+    manager = _load("pipeline")()
+    if args.action == "start":
+        async_command(manager.start_pipeline())
+    elif args.action == "stop":
+        async_command(manager.stop_pipeline())
+    elif args.action == "list":
+        async_command(manager.list_pipelines())
+
+# Command: katamari-cli aggregate
+def p_aggregate(aggregate_parser):
     aggregate_parser.add_argument(
         "metric", type=str, help="Metric name for aggregation"
     )
@@ -37,8 +67,16 @@ def main():
         "--end_date", type=str, help="End date for aggregation (YYYY-MM-DD)"
     )
 
-    # Command: katamari-cli auth
-    auth_parser = subparsers.add_parser("auth", help="Manage user authentication")
+def run_aggregate(args):
+    aggregator = _load("aggregate")()
+    async_command(
+        aggregator.run_aggregation(
+            metric=args.metric, start_date=args.start_date, end_date=args.end_date
+        )
+    )
+
+# Command: katamari-cli auth
+def p_auth(auth_parser):
     auth_parser.add_argument(
         "username", type=str, help="Username to authenticate"
     )
@@ -46,48 +84,55 @@ def main():
         "action", choices=["login", "logout", "status"], help="Authentication action"
     )
 
-    # Command: katamari-cli lambda
-    lambda_parser = subparsers.add_parser("lambda", help="Invoke a Lambda function")
+def run_auth(args):
+    iam = _load("auth")()
+    if args.action == "login":
+        async_command(iam.login(args.username))
+    elif args.action == "logout":
+        async_command(iam.logout(args.username))
+    elif args.action == "status":
+        async_command(iam.status(args.username))
+
+# Command: katamari-cli lambda
+def p_lambda(lambda_parser):
     lambda_parser.add_argument(
         "function_name", type=str, help="Name of the Lambda function to invoke"
     )
 
-    args = parser.parse_args()
+def run_lambda(args):
+    lambda_func = _load("lambda")(args.function_name)
+    async_command(lambda_func.invoke())
 
-    # Command logic
-    if args.command == "query":
-        async_command(KatamariORM.search(args.query))
-
-    elif args.command == "pipeline":
-        manager = PipelineManager()
-        if args.action == "start":
-            async_command(manager.start_pipeline())
-        elif args.action == "stop":
-            async_command(manager.stop_pipeline())
-        elif args.action == "list":
-            async_command(manager.list_pipelines())
-
-    elif args.command == "aggregate":
-        aggregator = KatamariAggregate()
-        async_command(
-            aggregator.run_aggregation(
-                metric=args.metric, start_date=args.start_date, end_date=args.end_date
-            )
-        )
+# command -> (help, argument builder, handler)
+COMMANDS = {
+    "query": ("Run a database query", p_query, run_query),
+    "pipeline": ("Manage pipelines", p_pipeline, run_pipeline),
+    "aggregate": ("Run data aggregation", p_aggregate, run_aggregate),
+    "auth": ("Manage user authentication", p_auth, run_auth),
+    "lambda": ("Invoke a Lambda function", p_lambda, run_lambda),
+}
 
-    elif args.command == "auth":
-        iam = KatamariIAM()
-        if args.action == "login":
-            async_command(iam.login(args.username))
-        elif args.action == "logout":
-            async_command(iam.logout(args.username))
-        elif args.action == "status":
-            async_command(iam.status(args.username))
+def main(argv=None):
+    # First pass: find the chosen command without building any subcommand arguments
+    pre_parser = argparse.ArgumentParser(add_help=False)
+    pre_parser.add_argument("command", nargs="?")
+    chosen, _ = pre_parser.parse_known_args(argv)
 
-    elif args.command == "lambda":
-        lambda_func = KatamariLambdaFunction(args.function_name)
-        async_command(lambda_func.invoke())
+    parser = argparse.ArgumentParser(
+        description="Katamari CLI - Command-line interface for managing the Katamari ecosystem"
+    )
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+    for name, (help_text, build, _) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        # Only the chosen command needs its arguments; the rest just appear in -h
+        if name == chosen.command:
+            build(subparser)
+
+    args = parser.parse_args(argv)
+
+    # Command logic
+    if args.command in COMMANDS:
+        COMMANDS[args.command][2](args)
 
 if __name__ == "__main__":
     main()
-
@@ -9,7 +9,7 @@ import threading
 import struct
 import sys
 from collections import defaultdict
-from typing import Any, Dict, Optional, List, Tuple
+from typing import Any, Dict, Iterable, Optional, List, Tuple
 from datetime import datetime
 import dateutil.parser
 import uuid
@@ -75,11 +75,33 @@ class KatamariMVCC:
                     return version.value  # Return the value visible to this transaction
             return None
 
-    def put(self, key: str, value: Any, tx_id: str):
-        """Write a new version of the key."""
-        new_version = VersionedValue(value, len(self.store[key]) + 1, time.time(), tx_id)
+    def multi_get(self, keys: Iterable[str], tx_id: Optional[str] = None) -> Dict[str, Any]:
+        """Retrieve many keys under one lock acquisition, with the same visibility rules as `get`.
+
+        Keys without a visible version are left out of the result.
+        """
+        found = {}
+        with self.lock:
+            transaction_start_time = None if tx_id is None else self.transactions.get(tx_id, time.time())
+            for key in keys:
+                versions = self.store.get(key)
+                if not versions:
+                    continue
+                if transaction_start_time is None:
+                    found[key] = versions[-1].value
+                    continue
+                for version in reversed(versions):
+                    if version.timestamp <= transaction_start_time:
+                        found[key] = version.value
+                        break
+        return found
+
+    def put(self, key: str, value: Any, tx_id: str) -> int:
+        """Write a new version of the key and return its version number."""
         with self.lock:
-            self.store[key].append(new_version)
+            versions = self.store[key]
+            versions.append(VersionedValue(value, len(versions) + 1, time.time(), tx_id))
+            return len(versions)
 
     def commit(self, tx_id: str):
         """Commit a transaction."""
@@ -1,27 +1,438 @@
-from typing import *
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Dict, List, Optional, Tuple
 import os
-from typing import Any
+import asyncio
+import contextlib
+import heapq
+import logging
+import random
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+import orjson
+
+logger = logging.getLogger("KatamariFailover")
+
+def sync_dir(path: str) -> None:
+    """Fsync a directory so that file creations, renames and removals inside it are durable."""
+    if sys.platform == 'win32':
+        return  # Directories cannot be opened for fsync on Windows
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_rename(src: str, dst: str) -> None:
+    """Atomically replace `dst` with `src` and make the rename durable."""
+    os.replace(src, dst)
+    sync_dir(os.path.dirname(dst) or ".")
+
+
+def _pread(fd: int, length: int, offset: int) -> bytes:
+    """Positional read that does not move the shared file offset where the platform allows it."""
+    if hasattr(os, "pread"):
+        return os.pread(fd, length, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, length)
+
+
+def _truncate(path: str, length: int) -> None:
+    """Cut a file back to `length` bytes and make the new size durable."""
+    fd = os.open(path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+    try:
+        os.ftruncate(fd, length)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SegmentWriter:
+    """Append-only writer over a directory of WAL segments named by their first LSN.
+
+    The active segment is held open with ``O_APPEND`` for the writer's lifetime, so
+    every write lands at the end of the file without a per-write open or seek.
+    """
+
+    SEGMENT_MAX = 16 * 1024 * 1024
+
+    def __init__(self, log_dir: str, prefix: str = "wal", segment_max: int = SEGMENT_MAX, dsync: bool = False):
+        self.log_dir = log_dir
+        self.prefix = prefix
+        self.segment_max = segment_max
+        # With O_DSYNC every write is durable when it returns, so explicit fsyncs are skipped
+        self.dsync = dsync and hasattr(os, "O_DSYNC")
+        self._flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        if self.dsync:
+            self._flags |= os.O_DSYNC
+        self.path: Optional[str] = None
+        self.fd: Optional[int] = None
+        self.bytes_written = 0
+        self._pattern = re.compile(rf"^{re.escape(prefix)}-(\d{{20}})\.log$")
+
+    def segments(self) -> List[str]:
+        """Return all segment paths, oldest first."""
+        names = sorted(name for name in os.listdir(self.log_dir) if self._pattern.match(name))
+        return [os.path.join(self.log_dir, name) for name in names]
+
+    def start_lsn(self, path: str) -> int:
+        """Return the first LSN encoded in a segment's file name."""
+        return int(self._pattern.match(os.path.basename(path)).group(1))
+
+    def open(self, next_lsn: int) -> bool:
+        """
+        Resume appending to the newest segment, or start one at `next_lsn`.
+
+        Returns:
+            bool: Whether a new segment file was created. The caller makes the creation
+            durable with `sync_dir`, so several writers can share one directory fsync.
+        """
+        segments = self.segments()
+        return self._open(segments[-1] if segments else self._segment_path(next_lsn))
+
+    def _segment_path(self, lsn: int) -> str:
+        return os.path.join(self.log_dir, f"{self.prefix}-{lsn:020d}.log")
+
+    def _open(self, path: str) -> bool:
+        self.path = path
+        self.fd = os.open(path, self._flags, 0o644)
+        self.bytes_written = os.lseek(self.fd, 0, os.SEEK_END)
+        return self.bytes_written == 0
+
+    def rotate(self, next_lsn: int) -> None:
+        """Seal the current segment and start a new one beginning at `next_lsn`."""
+        self.sync()
+        os.close(self.fd)
+        self._open(self._segment_path(next_lsn))
+        sync_dir(self.log_dir)
+
+    def append(self, data: memoryview, first_lsn: int) -> Tuple[str, int, bool]:
+        """
+        Append framed records, rotating first if they would overflow the segment.
+
+        Returns:
+            Tuple[str, int, bool]: The segment path, the offset of the first byte written,
+            and whether the segment was rotated.
+        """
+        rotated = False
+        if self.bytes_written and self.bytes_written + len(data) > self.segment_max:
+            self.rotate(first_lsn)
+            rotated = True
+        offset = self.bytes_written
+        try:
+            while data:
+                written = os.write(self.fd, data)
+                self.bytes_written += written
+                data = data[written:]
+        except OSError:
+            # Drop a partial group so later appends follow the last intact record
+            os.ftruncate(self.fd, offset)
+            self.bytes_written = offset
+            raise
+        return self.path, offset, rotated
+
+    def sync(self) -> None:
+        if not self.dsync:
+            os.fsync(self.fd)
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __del__(self):
+        self.close()
+
+
+class _Shard:
+    """One independent WAL stream: its own segments, framing buffer, queue and fsync group."""
+
+    def __init__(self, segments: SegmentWriter, buffer_size: int):
+        self.segments = segments
+        self.buf = bytearray(buffer_size)
+        self.queue: Optional[asyncio.Queue] = None
+        self.writer_task: Optional[asyncio.Task] = None
+        self.compaction_task: Optional[asyncio.Task] = None
+        self.compact_lock = threading.Lock()
+        self.unsynced = False
+        self.last_sync = time.monotonic()
+        self.last_lsn = 0  # Highest LSN found on disk during recovery
+
 
 class WALManager:
-    """Manages Write-Ahead Logging (WAL) for failover and recovery."""
+    """Manages Write-Ahead Logging (WAL) for failover and recovery.
 
-    def __init__(self, log_dir: str = "./wal_logs"):
+    The log is split into shards, each with its own rolling segment files and
+    background writer coroutine, so groups for different shards are written and
+    fsynced in parallel. A transaction always maps to the same shard, which keeps
+    its records in order. Within a shard, appends that arrive while a group is
+    being written are coalesced so that many transactions share one write and one
+    fsync. LSNs are allocated globally, and recovery merges the shards by LSN.
+    An in-memory index maps each transaction to the location of its latest record.
+
+    Each record is framed as ``LSN (u64) | length (u32) | CRC32 (u32) | payload``.
+    """
+
+    DURABILITY_POLICIES = ("every", "batched", "periodic")
+    RECORD_HEADER = struct.Struct(">QII")  # LSN, payload length, CRC32 of payload
+    BUFFER_SOFT_MAX = 128 * 1024  # Framing buffers are shrunk back to this size after large groups
+    SHARD_PATTERN = re.compile(r"^wal-(\d+)-\d{20}\.log$")
+
+    def __init__(self, log_dir: str = "./wal_logs", durability: str = "batched",
+                 sync_interval: float = 0.001, batch_size: int = 256, fsync_period: float = 1.0,
+                 segment_max: int = SegmentWriter.SEGMENT_MAX, compaction_ratio: float = 0.5,
+                 dsync: bool = False, shards: Optional[int] = None):
+        """
+        Args:
+            log_dir (str): Directory holding the WAL segments.
+            durability (str): Default policy for `write_log` ("every", "batched" or "periodic").
+            sync_interval (float): Seconds to wait for more appends before closing a group.
+            batch_size (int): Maximum number of records coalesced into one group.
+            fsync_period (float): Seconds between fsyncs for "periodic" records.
+            segment_max (int): Size in bytes at which a shard's active segment is rotated.
+            compaction_ratio (float): Fraction of dead bytes in a shard's sealed segments that
+                triggers compaction after a rotation.
+            dsync (bool): Open segments with O_DSYNC (where supported) so each group write is
+                durable on return instead of being followed by an fsync.
+            shards (Optional[int]): Number of WAL shards. Defaults to the CPU count. An existing
+                log keeps the shard count it was written with.
+        """
+        if durability not in self.DURABILITY_POLICIES:
+            raise ValueError(f"Unsupported durability policy: {durability}")
         # Ensure the directory for WAL logs exists
         os.makedirs(log_dir, exist_ok=True)
         self.log_dir = log_dir
+        self.durability = durability
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self.fsync_period = fsync_period
+        self.compaction_ratio = compaction_ratio
+        self._index: Dict[str, Tuple[str, int, int]] = {}  # tx_id -> (segment, offset, length)
+        self._read_fds: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._shards = [
+            _Shard(SegmentWriter(log_dir, prefix=f"wal-{i}", segment_max=segment_max, dsync=dsync),
+                   self.BUFFER_SOFT_MAX)
+            for i in range(self._shard_count(shards))
+        ]
+        self._next_lsn = self._recover() + 1
+        created = [shard.segments.open(self._next_lsn) for shard in self._shards]
+        if any(created):
+            sync_dir(log_dir)  # One directory fsync covers the new segments of every shard
+
+    def _shard_count(self, shards: Optional[int]) -> int:
+        """Return the shard count already on disk, or the requested one for a new log."""
+        found = [int(match.group(1)) for match in map(self.SHARD_PATTERN.match, os.listdir(self.log_dir)) if match]
+        if not found:
+            return shards or os.cpu_count() or 1
+        existing = max(found) + 1
+        if shards is not None and shards != existing:
+            # Transactions are routed by shard count, so it cannot change under an existing log
+            logger.warning(f"WAL in {self.log_dir} has {existing} shards; ignoring shards={shards}")
+        return existing
+
+    def _shard_for(self, transaction_id: str) -> _Shard:
+        """Route a transaction to a shard; stable across processes, unlike hash()."""
+        return self._shards[zlib.crc32(str(transaction_id).encode()) % len(self._shards)]
+
+    def _encode(self, op: str, transaction_id: Optional[str], data: Any = None) -> bytes:
+        """Serialize a record payload; framing is added by the writer."""
+        return orjson.dumps({"op": op, "tx": transaction_id, "data": data}, default=str)
+
+    def _ensure_writer(self, shard: _Shard) -> asyncio.Queue:
+        """Start a shard's background writer on first use, bound to the running loop."""
+        if shard.writer_task is None or shard.writer_task.done():
+            shard.queue = asyncio.Queue()
+            shard.writer_task = asyncio.create_task(self._process_writes(shard))
+        return shard.queue
+
+    async def _append(self, op: str, transaction_id: str, payload: bytes, durability: Optional[str]) -> int:
+        durability = durability or self.durability
+        if durability not in self.DURABILITY_POLICIES:
+            raise ValueError(f"Unsupported durability policy: {durability}")
+        lsn = self._next_lsn
+        self._next_lsn += 1
+        done = asyncio.get_running_loop().create_future()
+        queue = self._ensure_writer(self._shard_for(transaction_id))
+        await queue.put((lsn, op, transaction_id, payload, durability, done))
+        if durability != "periodic":
+            await done
+        return lsn
 
-    def write_log(self, transaction_id: str, data: Any) -> None:
+    async def write_log(self, transaction_id: str, data: Any, durability: Optional[str] = None) -> int:
         """
         Writes a transaction entry to the WAL log.
 
         Args:
             transaction_id (str): The unique ID for the transaction.
             data (Any): The data to be logged for recovery.
+            durability (Optional[str]): "every" is written and fsynced without waiting for
+                the coalescing window, "batched" waits for the fsync of the group it was
+                coalesced into, and "periodic" returns once queued and is fsynced at most
+                `fsync_period` seconds later. Defaults to the manager's policy.
+
+        Returns:
+            int: The log sequence number (LSN) assigned to the entry.
+        """
+        return await self._append("put", transaction_id, self._encode("put", transaction_id, data), durability)
+
+    async def _process_writes(self, shard: _Shard):
+        """Drain a shard's queue, writing each group with one write and at most one fsync."""
+        loop = asyncio.get_running_loop()
+        queue = shard.queue
+        while True:
+            timeout = self.fsync_period if shard.unsynced else None
+            try:
+                group = [await asyncio.wait_for(queue.get(), timeout=timeout)]
+            except asyncio.TimeoutError:
+                await asyncio.to_thread(self._sync, shard)
+                continue
+
+            # Keep coalescing until the window closes; an "every" record never waits for it
+            deadline = loop.time() + self.sync_interval
+            while group[-1][4] != "every" and len(group) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    group.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            error, rotated = None, False
+            try:
+                sync = any(item[4] != "periodic" for item in group)
+                rotated = await asyncio.to_thread(self._write, shard, [item[:4] for item in group], sync)
+            except Exception as e:
+                logger.error(f"Error writing WAL group: {e}")
+                error = e
+            if rotated:
+                self._start_compaction(shard)
+            for *_, durability, done in group:
+                queue.task_done()
+                if done.done():
+                    continue
+                if error is None:
+                    done.set_result(None)
+                elif durability != "periodic":
+                    done.set_exception(error)
+
+    def _frame(self, buf: bytearray, records: List[Tuple[int, bytes]]) -> Tuple[int, List[Tuple[int, int]]]:
+        """Frame records into a reusable buffer; return bytes used and each record's (offset, length)."""
+        header, used = self.RECORD_HEADER, 0
+        extents = []
+        for lsn, payload in records:
+            start = used + header.size
+            end = start + len(payload)
+            if end > len(buf):
+                buf.extend(bytes(end - len(buf)))
+            header.pack_into(buf, used, lsn, len(payload), zlib.crc32(payload))
+            buf[start:end] = payload
+            extents.append((used, end - used))
+            used = end
+        return used, extents
+
+    def _write(self, shard: _Shard, records: List[Tuple[int, str, str, bytes]], sync: bool) -> bool:
+        used, extents = self._frame(shard.buf, [(lsn, payload) for lsn, _, _, payload in records])
+        view = memoryview(shard.buf)[:used]
+        try:
+            path, base, rotated = shard.segments.append(view, records[0][0])
+        finally:
+            view.release()
+        if len(shard.buf) > self.BUFFER_SOFT_MAX:
+            del shard.buf[self.BUFFER_SOFT_MAX:]
+        with self._lock:
+            for (_, op, transaction_id, _), (offset, length) in zip(records, extents):
+                self._apply(op, transaction_id, (path, base + offset, length))
+        shard.unsynced = True
+        if sync or time.monotonic() - shard.last_sync >= self.fsync_period:
+            self._sync(shard)
+        return rotated
+
+    def _apply(self, op: str, transaction_id: Optional[str], location: Tuple[str, int, int]) -> None:
+        """Apply a record to the in-memory index."""
+        if op == "put":
+            self._index[transaction_id] = location
+        elif op == "del":
+            self._index.pop(transaction_id, None)
+
+    def _sync(self, shard: _Shard) -> None:
+        shard.segments.sync()
+        shard.unsynced = False
+        shard.last_sync = time.monotonic()
+
+    def _scan(self, path: str):
+        """Yield ``(lsn, record, offset, length)`` for every intact record, stopping at a torn or corrupt tail.
+
+        A bad tail is truncated away before the scan ends, so records appended after
+        recovery follow the last intact record and are found by the next recovery.
         """
-        with open(os.path.join(self.log_dir, f"{transaction_id}.wal"), "w") as file:
-            file.write(str(data))
+        with open(path, "rb") as file:
+            data = file.read()
+        header = self.RECORD_HEADER
+        offset = 0
+        while offset + header.size <= len(data):
+            lsn, length, crc = header.unpack_from(data, offset)
+            start = offset + header.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            yield lsn, orjson.loads(payload), offset, header.size + length
+            offset = start + length
+        if offset < len(data):
+            logger.warning(f"Truncating {len(data) - offset} bytes of torn or corrupt WAL data from {path}")
+            _truncate(path, offset)
+
+    def _replay(self, shard: _Shard, removed: List[str]):
+        """Yield ``(lsn, record, location)`` for a shard's records in LSN order, consuming compaction markers.
+
+        Segments superseded by a compaction are deleted and appended to `removed`.
+        """
+        segments, covered = shard.segments, 0
+        for path in segments.segments():
+            start_lsn = segments.start_lsn(path)
+            if start_lsn <= covered:
+                # Left behind by a compaction that crashed before removing its inputs
+                os.remove(path)
+                removed.append(path)
+                continue
+            shard.last_lsn = max(shard.last_lsn, start_lsn - 1)
+            for lsn, record, offset, length in self._scan(path):
+                shard.last_lsn = max(shard.last_lsn, lsn)
+                if record["op"] == "cmp":
+                    covered = record["data"]
+                else:
+                    yield lsn, record, (path, offset, length)
+
+    def _recover(self) -> int:
+        """Rebuild the index from the segments on disk and return the highest LSN seen."""
+        for name in os.listdir(self.log_dir):
+            if name.endswith(".compact"):
+                os.remove(os.path.join(self.log_dir, name))  # Unfinished compaction output
+        # Apply records from all shards in global LSN order
+        removed: List[str] = []
+        replay = heapq.merge(*(self._replay(shard, removed) for shard in self._shards), key=lambda entry: entry[0])
+        for _, record, location in replay:
+            self._apply(record["op"], record["tx"], location)
+        if removed:
+            sync_dir(self.log_dir)  # One directory fsync for all stale segments
+        return max(shard.last_lsn for shard in self._shards)
+
+    def _read_fd(self, path: str) -> int:
+        """Return a cached read-only descriptor for a segment; callers hold `_lock`."""
+        fd = self._read_fds.get(path)
+        if fd is None:
+            fd = self._read_fds[path] = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        return fd
+
+    def _read_record(self, location: Tuple[str, int, int]) -> dict:
+        path, offset, length = location
+        data = _pread(self._read_fd(path), length, offset)
+        return orjson.loads(data[self.RECORD_HEADER.size:])
 
     def read_log(self, transaction_id: str) -> Any:
         """
@@ -29,24 +440,126 @@ class WALManager:
 
         Args:
             transaction_id (str): The unique ID for the transaction to recover.
-        
+
         Returns:
             Any: The data stored in the WAL log for the transaction.
         """
-        log_path = os.path.join(self.log_dir, f"{transaction_id}.wal")
-        with open(log_path, "r") as file:
-            return file.read()
+        with self._lock:
+            location = self._index.get(transaction_id)
+            if location is None:
+                raise FileNotFoundError(f"No WAL entry for transaction {transaction_id}")
+            return self._read_record(location)["data"]
 
-    def delete_log(self, transaction_id: str) -> None:
+    async def delete_log(self, transaction_id: str, durability: Optional[str] = None) -> None:
         """
         Deletes a transaction entry from the WAL log once it is no longer needed.
 
+        Segments are append-only, so deletion is recorded as a tombstone and the
+        space is reclaimed by compaction.
+
         Args:
             transaction_id (str): The unique ID for the transaction.
         """
-        log_path = os.path.join(self.log_dir, f"{transaction_id}.wal")
-        if os.path.exists(log_path):
-            os.remove(log_path)
+        await self._append("del", transaction_id, self._encode("del", transaction_id), durability)
+
+    def _sealed_segments(self, shard: _Shard) -> Tuple[List[str], int]:
+        """Return the shard's segments its writer will never touch again, and its active segment's first LSN."""
+        segments = shard.segments
+        active_lsn = segments.start_lsn(segments.path)
+        sealed = [path for path in segments.segments() if segments.start_lsn(path) < active_lsn]
+        return sealed, active_lsn
+
+    def _should_compact(self, shard: _Shard) -> bool:
+        """Return True when dead records make up enough of the shard's sealed segments."""
+        sealed, _ = self._sealed_segments(shard)
+        if not sealed:
+            return False
+        total = sum(os.path.getsize(path) for path in sealed)
+        with self._lock:
+            live = sum(length for path, _, length in self._index.values() if path in sealed)
+        return total > 0 and (total - live) / total >= self.compaction_ratio
+
+    def _start_compaction(self, shard: _Shard) -> None:
+        """Schedule a background compaction of a shard if none is running and enough of it is dead."""
+        if shard.compaction_task is not None and not shard.compaction_task.done():
+            return
+        try:
+            if self._should_compact(shard):
+                shard.compaction_task = asyncio.create_task(self._compact_shard(shard))
+        except OSError as e:
+            logger.error(f"Could not evaluate WAL compaction: {e}")
+
+    async def compact(self) -> None:
+        """Rewrite the live records of each shard's sealed segments into one segment and drop the rest."""
+        await asyncio.gather(*(self._compact_shard(shard) for shard in self._shards))
+
+    async def _compact_shard(self, shard: _Shard) -> None:
+        try:
+            await asyncio.to_thread(self._compact, shard)
+        except Exception as e:
+            logger.error(f"WAL compaction failed: {e}")
+
+    def _compact(self, shard: _Shard) -> None:
+        with shard.compact_lock:
+            self._compact_sealed(shard)
+
+    def _compact_sealed(self, shard: _Shard) -> None:
+        sealed, active_lsn = self._sealed_segments(shard)
+        if not sealed:
+            return
+        target, temp_path = sealed[0], sealed[0] + ".compact"
+        covered = active_lsn - 1
+        with self._lock:
+            live = sorted((loc, tx) for tx, loc in self._index.items() if loc[0] in sealed)
+        # The marker tells recovery which older segments this one supersedes
+        marker = self._encode("cmp", None, covered)
+        relocated = []
+        with open(temp_path, "wb") as out:
+            out.write(self.RECORD_HEADER.pack(covered, len(marker), zlib.crc32(marker)) + marker)
+            for location, transaction_id in live:
+                with self._lock:
+                    record = _pread(self._read_fd(location[0]), location[2], location[1])
+                relocated.append((transaction_id, location, (target, out.tell(), len(record))))
+                out.write(record)
+            out.flush()
+            os.fsync(out.fileno())
+
+        with self._lock:
+            atomic_rename(temp_path, target)
+            for path in sealed:
+                fd = self._read_fds.pop(path, None)
+                if fd is not None:
+                    os.close(fd)
+            for transaction_id, old, new in relocated:
+                if self._index.get(transaction_id) == old:
+                    self._index[transaction_id] = new
+        # The removals need no directory fsync: if they are lost in a crash, recovery
+        # finds the segments superseded by the marker and removes them again
+        for path in sealed[1:]:
+            os.remove(path)
+
+    async def flush(self) -> None:
+        """Wait until every queued record has been written and fsynced."""
+        for shard in self._shards:
+            if shard.queue is not None and shard.writer_task is not None and not shard.writer_task.done():
+                await shard.queue.join()
+        await asyncio.gather(*(asyncio.to_thread(self._sync, shard) for shard in self._shards))
+
+    async def close(self) -> None:
+        """Flush pending records, stop background tasks and close all segments."""
+        await self.flush()
+        for shard in self._shards:
+            if shard.compaction_task is not None:
+                await shard.compaction_task
+            if shard.writer_task is not None:
+                shard.writer_task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await shard.writer_task
+            shard.segments.close()
+        with self._lock:
+            for fd in self._read_fds.values():
+                os.close(fd)
+            self._read_fds.clear()
 
 
 class KatamariProviderInterface(ABC):
@@ -119,17 +632,116 @@ class KatamariProviderInterface(ABC):
         pass
 
 
+def _instance_id(instance: Any) -> Optional[str]:
+    """Return the ID of a provisioned instance, as a provider's `provision_instance` reported it."""
+    if isinstance(instance, dict):
+        return instance.get("instance_id")
+    if isinstance(instance, str):
+        return instance
+    return getattr(instance, "instance_id", None)
+
+
 class KatamariFailover:
     """Manages failover logic between cloud providers."""
 
-    def __init__(self, providers: Dict[str, KatamariProviderInterface], wal_manager: WALManager):
+    def __init__(self, providers: Dict[str, KatamariProviderInterface], wal_manager: WALManager,
+                 provision_timeout: float = 5.0, retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 10.0):
+        """
+        Args:
+            providers (Dict[str, KatamariProviderInterface]): Providers keyed by name.
+            wal_manager (WALManager): WAL used to track failover operations.
+            provision_timeout (float): Seconds each candidate gets to provision an instance.
+            retries (int): Extra rounds to attempt once every candidate has failed.
+            backoff (float): Base delay in seconds before the first retry, doubled each round.
+            max_backoff (float): Upper bound on the delay between rounds.
+        """
         self.providers = providers
         self.wal_manager = wal_manager
+        self.provision_timeout = provision_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
 
     async def failover_to_provider(self, failed_provider: str, instance_type: str, region: str):
-        """Failover to another provider."""
+        """
+        Failover to another provider.
+
+        All remaining providers are raced and the first one to provision an instance
+        wins; the others are cancelled, and any that also finished provisioning have their
+        instance deleted. Failed or timed-out candidates are ignored while
+        any are still running. If every candidate fails, the round is retried after an
+        exponential backoff with full jitter.
+
+        Returns:
+            Any: The details of the instance provisioned by the winning provider.
+
+        Raises:
+            RuntimeError: If no provider could provision the instance.
+        """
         logger.error(f"Failover triggered: {failed_provider} failed. Switching to another provider.")
         available_providers = [p for p in self.providers if p != failed_provider]
-        for provider_name in available_providers:
-            provider = self.providers[provider_name]
-            return await provider.provision_instance(instance_type, region)
+        if not available_providers:
+            raise RuntimeError(f"No provider available to fail over from {failed_provider}")
+
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, delay))
+            try:
+                return await self._race_providers(available_providers, instance_type, region)
+            except RuntimeError as e:
+                last_error = e.__cause__ or e
+                logger.error(f"Failover attempt {attempt + 1} failed: {e}")
+        raise RuntimeError(f"Failover from {failed_provider} failed after {self.retries + 1} attempts") from last_error
+
+    async def _race_providers(self, provider_names: List[str], instance_type: str, region: str):
+        """Return the first successful provisioning among `provider_names`, cancelling the rest."""
+        tasks = {
+            asyncio.create_task(
+                asyncio.wait_for(self.providers[name].provision_instance(instance_type, region),
+                                 timeout=self.provision_timeout)
+            ): name
+            for name in provider_names
+        }
+        pending = set(tasks)
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = []
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        winners.append(task)
+                        continue
+                    logger.error(f"Provider {tasks[task]} failed to provision: {error!r}")
+                    last_error = error
+                if winners:
+                    winner, *extras = winners
+                    logger.info(f"Failed over to provider {tasks[winner]}")
+                    # Candidates that finished in the same step also hold an instance
+                    await self._release_instances([(tasks[task], task.result()) for task in extras])
+                    return winner.result()
+        finally:
+            # A candidate cancelled mid-provisioning may still leave an instance behind
+            # on the provider's side; there is no result to release it by
+            for task in pending:
+                task.cancel()
+        raise RuntimeError("All providers failed to provision an instance") from last_error
+
+    async def _release_instances(self, instances: List[Tuple[str, Any]]):
+        """Delete instances provisioned by candidates that lost the race, given as (provider, result)."""
+        async def release(name: str, instance: Any):
+            instance_id = _instance_id(instance)
+            if instance_id is None:
+                logger.warning(f"Provider {name} also provisioned {instance!r}, which has no instance ID to delete it by")
+                return
+            try:
+                await asyncio.wait_for(self.providers[name].delete_instance(instance_id), timeout=self.provision_timeout)
+                logger.info(f"Deleted extra instance {instance_id} from provider {name}")
+            except Exception as e:
+                logger.error(f"Failed to delete extra instance {instance_id} from provider {name}: {e!r}")
+
+        await asyncio.gather(*(release(name, instance) for name, instance in instances))
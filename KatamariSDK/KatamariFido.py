@@ -1,7 +1,5 @@
+import functools
 import logging
-import uuid
-from datetime import datetime
-from typing import Optional, List, Dict
 
 from KatamariSDK.KatamariDB import KatamariMVCC
 from KatamariSDK.KatamariKMS import KatamariKMS
@@ -13,6 +11,19 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("KatamariFido")
 
 
+@functools.lru_cache(maxsize=4)
+def _get_fido2_server(rp_id: str, rp_name: str) -> Fido2Server:
+    """Return the shared Fido2Server for a relying party; the server holds no per-request state."""
+    return Fido2Server(PublicKeyCredentialRpEntity(rp_id, rp_name))
+
+
+# Bounded so that registration attempts with arbitrary usernames cannot grow it without limit
+@functools.lru_cache(maxsize=1024)
+def _get_user_entity(username: str, display_name: str) -> PublicKeyCredentialUserEntity:
+    """Return the (cached) WebAuthn user entity for a username."""
+    return PublicKeyCredentialUserEntity(username.encode(), username, display_name)
+
+
 class KatamariFido:
     """FIDO2-based Identity and Access Management using KatamariMVCC and Fido2Server for passwordless authentication."""
 
@@ -22,51 +33,65 @@ class KatamariFido:
         self.vault = KatamariVault(self.kms)  # Initialize KatamariVault for secure secret storage
 
         # FIDO2 server configuration for katamari.ai
-        rp = PublicKeyCredentialRpEntity("katamari.ai", "Katamari Authentication")
-        self.fido2_server = Fido2Server(rp)
+        self.fido2_server = _get_fido2_server("katamari.ai", "Katamari Authentication")
 
     # FIDO2 registration for passwordless authentication
     def start_fido2_registration(self, username: str, display_name: str) -> dict:
         """Start FIDO2 registration process."""
-        user_entity = PublicKeyCredentialUserEntity(username.encode(), username, display_name)
+        user_entity = _get_user_entity(username, display_name)
         registration_data, state = self.fido2_server.register_begin(user_entity)
-        self.katamari_mvcc.put(f"fido2_registration_state:{username}", state)
+        tx_id = self.katamari_mvcc.begin_transaction()
+        self.katamari_mvcc.put(f"fido2_registration_state:{username}", state, tx_id)
+        self.katamari_mvcc.commit(tx_id)
         return registration_data
 
     def complete_fido2_registration(self, username: str, client_data: dict):
         """Complete FIDO2 registration process."""
-        state = self.katamari_mvcc.get(f"fido2_registration_state:{username}")
-        auth_data = self.fido2_server.register_complete(state, client_data["clientDataJSON"],
-                                                        client_data["attestationObject"])
-        fido2_data = {
-            "credential_id": auth_data.credential_id,
-            "public_key": auth_data.public_key,
-            "sign_count": auth_data.sign_count,
-        }
-        self.katamari_mvcc.put(f"user:{username}_fido2_data", fido2_data)
+        tx_id = self.katamari_mvcc.begin_transaction()
+        try:
+            state = self.katamari_mvcc.get(f"fido2_registration_state:{username}", tx_id)
+            auth_data = self.fido2_server.register_complete(state, client_data["clientDataJSON"],
+                                                            client_data["attestationObject"])
+            fido2_data = {
+                "credential_id": auth_data.credential_id,
+                "public_key": auth_data.public_key,
+                "sign_count": auth_data.sign_count,
+            }
+            self.katamari_mvcc.put(f"user:{username}_fido2_data", fido2_data, tx_id)
+        finally:
+            self.katamari_mvcc.commit(tx_id)
         return fido2_data
 
     # FIDO2 authentication
     def start_fido2_authentication(self, username: str) -> dict:
         """Begin FIDO2 authentication for a user."""
-        fido2_data = self.katamari_mvcc.get(f"user:{username}_fido2_data")
-        if not fido2_data:
-            raise ValueError("FIDO2 credentials not registered for user")
-        auth_data, state = self.fido2_server.authenticate_begin([fido2_data])
-        self.katamari_mvcc.put(f"fido2_authentication_state:{username}", state)
+        tx_id = self.katamari_mvcc.begin_transaction()
+        try:
+            fido2_data = self.katamari_mvcc.get(f"user:{username}_fido2_data", tx_id)
+            if not fido2_data:
+                raise ValueError("FIDO2 credentials not registered for user")
+            auth_data, state = self.fido2_server.authenticate_begin([fido2_data])
+            self.katamari_mvcc.put(f"fido2_authentication_state:{username}", state, tx_id)
+        finally:
+            self.katamari_mvcc.commit(tx_id)
         return auth_data
 
     def complete_fido2_authentication(self, username: str, client_data: dict) -> bool:
         """Complete FIDO2 authentication process."""
-        state = self.katamari_mvcc.get(f"fido2_authentication_state:{username}")
-        fido2_data = self.katamari_mvcc.get(f"user:{username}_fido2_data")
-        auth_result = self.fido2_server.authenticate_complete(
-            state, fido2_data["credential_id"], client_data["clientDataJSON"], client_data["authenticatorData"],
-            client_data["signature"]
-        )
-        # Update sign count for replay protection
-        fido2_data["sign_count"] = auth_result.new_sign_count
-        self.katamari_mvcc.put(f"user:{username}_fido2_data", fido2_data)
+        # One transaction covers both reads and the sign-count write
+        tx_id = self.katamari_mvcc.begin_transaction()
+        try:
+            state = self.katamari_mvcc.get(f"fido2_authentication_state:{username}", tx_id)
+            fido2_data = self.katamari_mvcc.get(f"user:{username}_fido2_data", tx_id)
+            auth_result = self.fido2_server.authenticate_complete(
+                state, fido2_data["credential_id"], client_data["clientDataJSON"], client_data["authenticatorData"],
+                client_data["signature"]
+            )
+            # Update sign count for replay protection
+            fido2_data["sign_count"] = auth_result.new_sign_count
+            self.katamari_mvcc.put(f"user:{username}_fido2_data", fido2_data, tx_id)
+        finally:
+            self.katamari_mvcc.commit(tx_id)
         return True
 
 
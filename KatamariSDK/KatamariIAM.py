@@ -1,11 +1,16 @@
-import os
-import json
+import base64
+import functools
+import hashlib
+import heapq
+import hmac
 import logging
+import math
+import time
 import uuid
-import jwt  # Using PyJWT for token encoding/decoding
-import argon2  # Argon2 for password hashing
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict
+import orjson
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+from typing import Dict, Optional, List, Tuple
 
 from KatamariSDK.KatamariDB import KatamariMVCC  # Assuming KatamariDB with MVCC is available
 from KatamariSDK.KatamariKMS import KatamariKMS
@@ -14,6 +19,52 @@ from KatamariSDK.KatamariVault import KatamariVault
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("KatamariIAM")
 
+# Tokens are always HS256 with this header, so its base64url encoding is computed once
+_JWT_HEADER_B64 = b"eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9"  # {"alg":"HS256","typ":"JWT"}
+
+
+def _b64url(data: bytes) -> bytes:
+    """Unpadded base64url encoding, as used by JWS."""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+# jwt and argon2 are imported on first use, so importing this module does not load the
+# Argon2 extension unless passwords are actually hashed or verified.
+@functools.lru_cache(maxsize=None)
+def _get_hasher():
+    """Return the Argon2 hasher shared across the process.
+
+    Parameters are tuned for interactive logins (2 passes over 64 MiB, single lane);
+    hashes made with other parameters still verify.
+    """
+    import argon2
+    return argon2.PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1)
+
+
+# Fixed field layouts for records kept in KatamariMVCC. Every version of every record stays
+# in memory, so records are stored as tuples prefixed with a format version instead of
+# dicts that repeat their field names in a hash table per version.
+_RECORD_FORMAT = 1
+_USER_SCHEMA = ("username", "roles", "created_at")
+_SESSION_SCHEMA = ("username", "expires_at", "expires_at_ts")
+_SERVICE_SCHEMA = ("account_name", "roles", "is_service_account", "created_at", "api_key_expiry", "api_key_expiry_ts")
+_TOKEN_SCHEMA = ("subject", "expires_at", "expires_at_ts", "token_type")
+
+
+def _utc_timestamp(value: datetime) -> int:
+    """Unix timestamp of a datetime; naive values are treated as UTC, as produced by utcnow()."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _is_expired(record: dict, field: str) -> bool:
+    """Check a record's expiry using its integer `<field>_ts`, parsing the ISO string only for older records."""
+    expires_at_ts = record.get(f"{field}_ts")
+    if expires_at_ts is None:
+        expires_at_ts = _utc_timestamp(datetime.fromisoformat(record[field]))
+    return time.time() > expires_at_ts
+
 
 class User:
     def __init__(self, username: str, password_hash: Optional[str] = None, roles: List[str] = None,
@@ -37,8 +88,29 @@ class KatamariIAM:
         self.token_expiry = timedelta(hours=1)  # Session token expiry duration
         self.api_key_expiry = timedelta(days=30)  # API key expiry duration for service accounts
         self.refresh_token_expiry = timedelta(days=7)  # Refresh token expiry
-        self.secret_key = secret_key  # Secret key for signing JWT tokens
-        self.password_hasher = argon2.PasswordHasher()  # Argon2 password hasher
+        self.jwt_cache_size = 4096  # Maximum number of verified tokens kept in memory
+        self._jwt_cache: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()  # digest -> (payload, exp)
+        self.secret_key = secret_key  # Secret key for signing JWT tokens; also keys _jwt_mac
+        # Revoked token digests, checked before the cache; kept only until the token expires,
+        # after which jwt.decode rejects it anyway
+        self._revoked_tokens: Dict[bytes, float] = {}  # digest -> exp
+        self._revoked_expiry: List[Tuple[float, bytes]] = []  # (exp, digest) min-heap for pruning
+
+    @property
+    def secret_key(self) -> str:
+        """Key that signs and verifies JWTs and API key digests; setting it rotates all of them."""
+        return self._secret_key
+
+    @secret_key.setter
+    def secret_key(self, secret_key: str):
+        self._secret_key = secret_key
+        self._jwt_mac = hmac.new(secret_key.encode(), digestmod=hashlib.sha256)  # Keyed HMAC, copied per token
+        self._jwt_cache.clear()  # Tokens verified under the old key must be checked again
+
+    @property
+    def password_hasher(self):
+        """Shared Argon2 password hasher, created on first use."""
+        return _get_hasher()
 
     # Hash password and store securely using KatamariVault
     def hash_password_and_store(self, username: str, password: str) -> str:
@@ -50,42 +122,120 @@ class KatamariIAM:
     # Verify password using hashed value stored in KatamariVault
     def verify_password(self, username: str, password: str) -> bool:
         """Verify a password using the encrypted hash from KatamariVault."""
+        from argon2.exceptions import VerifyMismatchError
         stored_hash = self.vault.get_secret("katamari_secret_key", f"{username}_password")
         try:
-            return self.password_hasher.verify(stored_hash, password)
-        except argon2.exceptions.VerifyMismatchError:
+            self.password_hasher.verify(stored_hash, password)
+        except VerifyMismatchError:
             return False
+        # Upgrade hashes created with older parameters while the plaintext is at hand
+        if self.password_hasher.check_needs_rehash(stored_hash):
+            self.hash_password_and_store(username, password)
+        return True
+
+    # API keys are random, so a keyed hash is enough; Argon2's work factor is only needed for passwords
+    def hash_api_key(self, api_key: str) -> str:
+        """Return the HMAC-SHA256 digest of an API key, keyed with the IAM secret."""
+        return hmac.new(self.secret_key.encode(), api_key.encode(), hashlib.sha256).hexdigest()
+
+    def _put_record(self, key: str, schema: Tuple[str, ...], record: dict, tx_id: str):
+        """Store a record in its compact fixed-schema form."""
+        self.katamari_mvcc.put(key, (_RECORD_FORMAT,) + tuple(record[field] for field in schema), tx_id)
+
+    def _get_record(self, key: str, schema: Tuple[str, ...], tx_id: str) -> Optional[dict]:
+        """Load a record stored by `_put_record` back into a dict."""
+        stored = self.katamari_mvcc.get(key, tx_id)
+        if stored is None or isinstance(stored, dict):
+            return stored
+        if stored[0] != _RECORD_FORMAT:
+            raise ValueError(f"Unsupported record format {stored[0]} for {key}")
+        return dict(zip(schema, stored[1:]))
 
     # Generate a JWT token
     def generate_jwt(self, subject: str, roles: List[str], expires_in: timedelta) -> str:
-        """Generate a JWT token for a user or service account."""
-        expiration = datetime.utcnow() + expires_in
-        token = jwt.encode({
-            "sub": subject,
-            "roles": roles,
-            "exp": expiration
-        }, self.secret_key, algorithm="HS256")
-        return token
+        """Generate a JWT token for a user or service account.
+
+        The header and HMAC key are fixed, so the token is assembled directly instead of
+        going through PyJWT's general-purpose encoder; `decode_jwt` verifies it as usual.
+        """
+        expiration = _utc_timestamp(datetime.utcnow() + expires_in)
+        payload = orjson.dumps({"sub": subject, "roles": roles, "exp": expiration})
+        signing_input = _JWT_HEADER_B64 + b"." + _b64url(payload)
+        mac = self._jwt_mac.copy()
+        mac.update(signing_input)
+        return (signing_input + b"." + _b64url(mac.digest())).decode("ascii")
+
+    @staticmethod
+    def _token_digest(token: str) -> bytes:
+        """Fixed-size cache key for a token, so cache memory does not grow with token length."""
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
 
     # Decode and validate a JWT token
     def decode_jwt(self, token: str) -> Optional[dict]:
-        """Decode and validate a JWT token."""
+        """Decode and validate a JWT token, reusing earlier verifications until the token expires."""
+        digest = self._token_digest(token)
+        if digest in self._revoked_tokens:
+            logger.error("Token has been revoked.")
+            return None
+
+        cached = self._jwt_cache.get(digest)
+        if cached is not None:
+            payload, expires_at = cached
+            if expires_at > time.time():
+                self._jwt_cache.move_to_end(digest)
+                return dict(payload)
+            del self._jwt_cache[digest]
+
+        import jwt
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=["HS256"])
-            return payload
         except jwt.ExpiredSignatureError:
             logger.error("Token has expired.")
+            return None
         except jwt.InvalidTokenError:
             logger.error("Invalid token.")
-        return None
+            return None
+
+        if "exp" in payload:
+            self._jwt_cache[digest] = (dict(payload), float(payload["exp"]))
+            if len(self._jwt_cache) > self.jwt_cache_size:
+                self._jwt_cache.popitem(last=False)  # Evict the least recently used token
+                self._prune_revoked()
+        return payload
+
+    def revoke_token(self, token: str):
+        """Revoke a token so that it is rejected even if it is still cached or unexpired."""
+        digest = self._token_digest(token)
+        cached = self._jwt_cache.pop(digest, None)
+        if cached is not None:
+            expires_at = cached[1]
+        else:
+            import jwt
+            try:
+                payload = jwt.decode(token, self.secret_key, algorithms=["HS256"], options={"verify_exp": False})
+            except jwt.InvalidTokenError:
+                return  # Never accepted by decode_jwt, so there is nothing to revoke
+            expires_at = float(payload.get("exp", math.inf))
+        self._prune_revoked()
+        if expires_at > time.time() and digest not in self._revoked_tokens:
+            self._revoked_tokens[digest] = expires_at
+            heapq.heappush(self._revoked_expiry, (expires_at, digest))
+
+    def _prune_revoked(self):
+        """Forget revoked tokens that have expired since they were revoked."""
+        now = time.time()
+        while self._revoked_expiry and self._revoked_expiry[0][0] <= now:
+            _, digest = heapq.heappop(self._revoked_expiry)
+            self._revoked_tokens.pop(digest, None)
 
     # Store token metadata for auditing or future revocation
     def store_token_metadata(self, token: str, subject: str, expires_at: datetime, token_type: str):
         """Store issued token metadata."""
         tx_id = self.katamari_mvcc.begin_transaction()
-        self.katamari_mvcc.put(f"token:{token}", {
+        self._put_record(f"token:{token}", _TOKEN_SCHEMA, {
             "subject": subject,
             "expires_at": expires_at.isoformat(),
+            "expires_at_ts": _utc_timestamp(expires_at),
             "token_type": token_type,
         }, tx_id)
         self.katamari_mvcc.commit(tx_id)
@@ -94,14 +244,14 @@ class KatamariIAM:
         """Create a new user with Argon2-based password hashing."""
         tx_id = self.katamari_mvcc.begin_transaction()
         try:
-            if self.katamari_mvcc.get(f"user:{username}", tx_id):
+            if self._get_record(f"user:{username}", _USER_SCHEMA, tx_id):
                 raise ValueError("Username already exists")
 
             password_hash = self.hash_password_and_store(username, password)
             user = User(username, password_hash, roles)
 
             # Store user data without password
-            self.katamari_mvcc.put(f"user:{username}", {
+            self._put_record(f"user:{username}", _USER_SCHEMA, {
                 "username": username,
                 "roles": user.roles,
                 "created_at": user.created_at.isoformat()
@@ -117,7 +267,7 @@ class KatamariIAM:
         """Authenticate a user using Argon2 and return OAuth2 JWT token."""
         tx_id = self.katamari_mvcc.begin_transaction()
         try:
-            user_data = self.katamari_mvcc.get(f"user:{username}", tx_id)
+            user_data = self._get_record(f"user:{username}", _USER_SCHEMA, tx_id)
             if not user_data:
                 raise ValueError("User not found")
 
@@ -129,9 +279,11 @@ class KatamariIAM:
             refresh_token = str(uuid.uuid4())  # Random UUID for refresh token
 
             # Store refresh token in the database
-            self.katamari_mvcc.put(f"session:{refresh_token}", {
+            expires_at = datetime.utcnow() + self.refresh_token_expiry
+            self._put_record(f"session:{refresh_token}", _SESSION_SCHEMA, {
                 "username": username,
-                "expires_at": (datetime.utcnow() + self.refresh_token_expiry).isoformat()
+                "expires_at": expires_at.isoformat(),
+                "expires_at_ts": _utc_timestamp(expires_at)
             }, tx_id)
 
             self.katamari_mvcc.commit(tx_id)
@@ -146,16 +298,15 @@ class KatamariIAM:
         """Refresh an OAuth2 token using the refresh token."""
         tx_id = self.katamari_mvcc.begin_transaction()
         try:
-            session_data = self.katamari_mvcc.get(f"session:{refresh_token}", tx_id)
+            session_data = self._get_record(f"session:{refresh_token}", _SESSION_SCHEMA, tx_id)
             if not session_data:
                 raise ValueError("Invalid refresh token")
 
-            expiry_time = datetime.fromisoformat(session_data["expires_at"])
-            if datetime.utcnow() > expiry_time:
+            if _is_expired(session_data, "expires_at"):
                 raise ValueError("Refresh token has expired")
 
             username = session_data["username"]
-            user_data = self.katamari_mvcc.get(f"user:{username}", tx_id)
+            user_data = self._get_record(f"user:{username}", _USER_SCHEMA, tx_id)
             if not user_data:
                 raise ValueError("User not found")
 
@@ -181,22 +332,24 @@ class KatamariIAM:
         """Create a new service account with an API key."""
         tx_id = self.katamari_mvcc.begin_transaction()
         try:
-            if self.katamari_mvcc.get(f"service:{account_name}", tx_id):
+            if self._get_record(f"service:{account_name}", _SERVICE_SCHEMA, tx_id):
                 raise ValueError("Service account already exists")
 
             api_key = str(uuid.uuid4())  # Generate API key
             service_account = User(account_name, roles=roles, is_service_account=True)
             service_account.api_key = api_key
 
-            # Store API key securely in KatamariVault
-            self.vault.store_secret("katamari_secret_key", f"{account_name}_api_key", api_key)
+            # Store only the keyed digest of the API key in KatamariVault
+            self.vault.store_secret("katamari_secret_key", f"{account_name}_api_key", self.hash_api_key(api_key))
 
-            self.katamari_mvcc.put(f"service:{account_name}", {
+            api_key_expiry = datetime.utcnow() + self.api_key_expiry
+            self._put_record(f"service:{account_name}", _SERVICE_SCHEMA, {
                 "account_name": account_name,
                 "roles": service_account.roles,
                 "is_service_account": True,
                 "created_at": service_account.created_at.isoformat(),
-                "api_key_expiry": (datetime.utcnow() + self.api_key_expiry).isoformat()
+                "api_key_expiry": api_key_expiry.isoformat(),
+                "api_key_expiry_ts": _utc_timestamp(api_key_expiry)
             }, tx_id)
 
             self.katamari_mvcc.commit(tx_id)
@@ -211,16 +364,15 @@ class KatamariIAM:
         """Authenticate a service account using API key and return JWT."""
         tx_id = self.katamari_mvcc.begin_transaction()
         try:
-            account_data = self.katamari_mvcc.get(f"service:{account_name}", tx_id)
+            account_data = self._get_record(f"service:{account_name}", _SERVICE_SCHEMA, tx_id)
             if not account_data:
                 raise ValueError("Service account not found")
 
-            stored_api_key = self.vault.get_secret("katamari_secret_key", f"{account_name}_api_key")
-            if api_key != stored_api_key:
+            stored_digest = self.vault.get_secret("katamari_secret_key", f"{account_name}_api_key")
+            if not hmac.compare_digest(self.hash_api_key(api_key), stored_digest):
                 raise ValueError("Invalid API key")
 
-            expiry_time = datetime.fromisoformat(account_data["api_key_expiry"])
-            if datetime.utcnow() > expiry_time:
+            if _is_expired(account_data, "api_key_expiry"):
                 raise ValueError("API key has expired")
 
             # Generate JWT token for service account
@@ -125,10 +125,12 @@ class KatamariLambdaManager:
         while True:
             for function in self.functions:
                 if function.schedule:  # Only schedule functions with a schedule
-                    interval = parse_time_string(function.schedule)
-                    logger.info(f"Scheduling Lambda function {function.name} to run every {function.schedule}.")
                     await function.invoke()  # Invoke the function
-                    await asyncio.sleep(interval)  # Wait for the next scheduled run
+                    # Read after the run, so a handler that reschedules itself takes effect immediately
+                    if function.schedule:
+                        interval = parse_time_string(function.schedule)
+                        logger.info(f"Scheduling Lambda function {function.name} to run every {function.schedule}.")
+                        await asyncio.sleep(interval)  # Wait for the next scheduled run
 
 # ----------------------- Example Usage -----------------------
 
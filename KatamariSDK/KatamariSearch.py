@@ -1,19 +1,125 @@
+import asyncio
+import logging
 import os
 import tempfile
-from typing import *
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-from whoosh.fields import ID, TEXT, NUMERIC, DATETIME, Schema
-from whoosh.index import create_in, exists_in, open_dir
-from whoosh.qparser import MultifieldParser, AndGroup
+from cachetools import LRUCache
+from whoosh.fields import ID, TEXT, NUMERIC, DATETIME, Schema, UnknownFieldError
+from whoosh import query
+from whoosh.index import LockError, create_in, exists_in, open_dir
+from whoosh.qparser import MultifieldParser
 from whoosh.qparser.dateparse import DateParserPlugin
 
+logger = logging.getLogger("KatamariSearch")
+
+# Field type name -> factory for the stored Whoosh field
+_FIELD_FACTORIES = {
+    'TEXT': lambda: TEXT(stored=True),
+    'NUMERIC': lambda: NUMERIC(stored=True),
+    'DATETIME': lambda: DATETIME(stored=True),
+}
+
+# Shared, bounded pool for blocking Whoosh searches so concurrent queries don't churn threads
+_SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="KatamariSearch")
+
+class _BatchWriter:
+    """Buffers documents and commits them to the index in batches.
+
+    A batch is committed once `limit` documents are buffered or `period` seconds after
+    its first document, whichever comes first. The index writer (and its lock) is only
+    held while a batch commits, and no timer runs while nothing is buffered.
+    """
+
+    def __init__(self, index, period: float, limit: int, lock_timeout: float = 5.0):
+        self.index = index
+        self.period = period
+        self.limit = limit
+        self.lock_timeout = lock_timeout  # Seconds to wait for another writer's lock
+        self._pending: List[dict] = []
+        self._pending_lock = threading.Lock()
+        self._commit_lock = threading.Lock()  # Batches commit one at a time, in order
+        self._timer: Optional[threading.Timer] = None
+
+    def add(self, document: dict):
+        """Buffer a document, committing the batch once it is full."""
+        with self._pending_lock:
+            self._pending.append(document)
+            full = len(self._pending) >= self.limit
+            if not full and self._timer is None:
+                # Daemon, so a KatamariSearch that is never closed cannot hold up interpreter exit
+                self._timer = threading.Timer(self.period, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def has_pending(self) -> bool:
+        """Whether any documents are waiting for a commit."""
+        return bool(self._pending)
+
+    def flush(self):
+        """Commit every buffered document in one writer session."""
+        with self._commit_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not batch:
+                return
+            try:
+                self._commit(batch)
+            except (LockError, OSError):
+                self._requeue(batch)
+                raise
+            except Exception as e:
+                # Whoosh rejected a document, which cancels the whole batch; commit the
+                # documents one by one so only the rejected ones are dropped
+                logger.error(f"Batch of {len(batch)} documents rejected ({e!r}); committing them one by one")
+                for position, document in enumerate(batch):
+                    try:
+                        self._commit([document])
+                    except (LockError, OSError):
+                        self._requeue(batch[position:])
+                        raise
+                    except Exception as e:
+                        logger.error(f"Dropping document {document.get('id')!r} rejected by the index: {e!r}")
+
+    def _commit(self, documents: List[dict]):
+        """Write documents in one writer session."""
+        with self.index.writer(timeout=self.lock_timeout) as writer:
+            for document in documents:
+                writer.update_document(**document)
+
+    def _requeue(self, documents: List[dict]):
+        """Put documents back ahead of newer ones, so a lock or I/O failure is retried by the next flush."""
+        with self._pending_lock:
+            self._pending[:0] = documents
+
 class KatamariSearch:
     """Search index integrated with MVCC."""
 
-    def __init__(self, schema_fields: Optional[Dict[str, str]] = None, index_dir: Optional[str] = None):
+    def __init__(self, schema_fields: Optional[Dict[str, str]] = None, index_dir: Optional[str] = None,
+                 commit_period: float = 1.0, commit_limit: int = 1000):
         self.index_dir = index_dir or tempfile.mkdtemp()  # Use temporary directory for the index
         self.schema = self._create_schema(schema_fields)
         self.index = self._create_or_open_index()
+        # Documents are buffered in memory and committed as a batch every `commit_period`
+        # seconds or every `commit_limit` documents, whichever comes first
+        self._writer = _BatchWriter(self.index, commit_period, commit_limit)
+        # Commits whatever is still buffered if the instance is collected or the interpreter
+        # exits without close(); it references only the writer, never self
+        self._finalizer = weakref.finalize(self, self._writer.flush)
+        # Per-instance caches: parsers per field list, and parsed queries per (fields, query string).
+        # Searches run on several executor threads: a parser keeps state while it parses, so each
+        # thread builds its own, while parsed queries are only read by searches and can be shared
+        self._parsers = threading.local()
+        self._query_cache = LRUCache(maxsize=1024)
+        self._query_cache_lock = threading.Lock()  # LRUCache reorders itself even on reads
 
     def _create_schema(self, fields: Dict[str, str]) -> Schema:
         """Create schema from fields."""
@@ -23,16 +129,10 @@ class KatamariSearch:
         }
         # Update schema with provided fields
         for field_name, field_type in fields.items():
-            if field_type == 'TEXT':
-                schema_dict[field_name] = TEXT(stored=True)
-            elif field_type == 'NUMERIC':
-                schema_dict[field_name] = NUMERIC(stored=True)
-            elif field_type == 'DATETIME':
-                schema_dict[field_name] = DATETIME(stored=True)
-            else:
-                raise ValueError(f"Unsupported field type: {field_type}")
-        
-        print(f"Schema fields: {list(schema_dict.keys())}")  # Debugging statement to show schema fields
+            try:
+                schema_dict[field_name] = _FIELD_FACTORIES[field_type]()
+            except KeyError:
+                raise ValueError(f"Unsupported field type: {field_type}") from None
         return Schema(**schema_dict)
 
     def _create_or_open_index(self):
@@ -44,27 +144,78 @@ class KatamariSearch:
             return open_dir(self.index_dir)
 
     def _index_document(self, key, value, version, timestamp):
-        """Immediately index a document after it's written."""
-        with self.index.writer() as writer:
-            document = {
-                'id': key,
-                'timestamp': datetime.utcfromtimestamp(timestamp),
-                'version': version
-            }
-            document.update(value)
-            writer.update_document(**document)
-
-    async def search(self, query_str: str, tx_start_time: float, schema_fields: List[str]):
-        """Search for documents with version-awareness (filter by timestamp)."""
+        """Buffer a document for indexing after it's written; the next search commits it first."""
+        document = {
+            'id': key,
+            'timestamp': datetime.utcfromtimestamp(timestamp),
+            'version': version
+        }
+        document.update(value)
+        # Commits happen later, so reject unknown fields now, while the caller can still handle it
+        unknown = document.keys() - set(self.index.schema.names())
+        if unknown:
+            raise UnknownFieldError(f"No field named {sorted(unknown)[0]!r} in {self.index.schema}")
+        self._writer.add(document)
+
+    async def search(self, query_str: str, tx_start_time: float, schema_fields: List[str], limit: Optional[int] = 1000):
+        """Search for documents with version-awareness (filter by timestamp).
+
+        Only documents indexed at or before `tx_start_time` are returned, best `limit` first
+        (`None` returns every match).
+        """
+        # Whoosh searching is blocking disk I/O and scoring, so keep it off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_SEARCH_EXECUTOR, self._search_sync, query_str, tx_start_time, schema_fields, limit)
+
+    def _search_sync(self, query_str: str, tx_start_time: float, schema_fields: List[str], limit: Optional[int]):
+        """Blocking implementation of `search`."""
+        # Documents written before the search must be visible to it
+        if self._writer.has_pending():
+            self._writer.flush()
         with self.index.searcher() as searcher:
-            query = MultifieldParser(schema_fields, self.schema).parse(query_str)
-            results = searcher.search(query, limit=None)
+            parsed = self._parse(tuple(schema_fields), query_str)
+            # Version-awareness is applied in the index so non-visible documents are never scored
+            visible = query.DateRange('timestamp', None, datetime.utcfromtimestamp(tx_start_time))
+            results = searcher.search(query.And([parsed, visible]), limit=limit)
+            # Stored fields must be read before the searcher closes its reader
+            return [hit.fields() for hit in results]
+
+    def _get_parser(self, schema_fields: Tuple[str, ...]) -> MultifieldParser:
+        """Return this thread's parser over `schema_fields`, building it on first use."""
+        parsers = getattr(self._parsers, "by_fields", None)
+        if parsers is None:
+            parsers = self._parsers.by_fields = {}
+        parser = parsers.get(schema_fields)
+        if parser is None:
+            parser = parsers[schema_fields] = self._create_parser(schema_fields)
+        return parser
+
+    def _create_parser(self, schema_fields: Tuple[str, ...]) -> MultifieldParser:
+        """Build a query parser over `schema_fields` with natural-language date support."""
+        parser = MultifieldParser(list(schema_fields), self.schema)
+        parser.add_plugin(DateParserPlugin())
+        return parser
+
+    def _parse(self, schema_fields: Tuple[str, ...], query_str: str) -> query.Query:
+        """Parse `query_str` with the cached parser for `schema_fields`, reusing earlier parses."""
+        cache_key = (schema_fields, query_str)
+        with self._query_cache_lock:
+            parsed = self._query_cache.get(cache_key)
+        if parsed is None:
+            parsed = self._get_parser(schema_fields).parse(query_str)
+            # DateParserPlugin resolves relative dates ("today", "-2 days") to absolute ranges
+            # at parse time, so a query containing a date range is only valid for this call
+            if not any(isinstance(leaf, query.DateRange) for leaf in parsed.leaves()):
+                with self._query_cache_lock:
+                    self._query_cache[cache_key] = parsed
+        return parsed
 
-            # Filter results by transaction start time (version-awareness)
-            filtered_results = [result for result in results if result['timestamp'] <= datetime.utcfromtimestamp(tx_start_time)]
-            return filtered_results
+    def flush(self):
+        """Commit all buffered documents to the on-disk index."""
+        self._writer.flush()
 
     def close(self):
-        """Close the index."""
+        """Commit buffered documents and close the index."""
+        self._finalizer()  # Flushes once; later calls and collection do nothing
         self.index.close()
 
@@ -0,0 +1,517 @@
+"""Shared scaffolding for the real-time tracker examples.
+
+`make_tracker_app` builds a FastAPI app that polls an upstream JSON feed on a
+KatamariLambda schedule, versions every record in KatamariMVCC, and streams the
+changes to browsers over a WebSocket: one snapshot on connect, then deltas.
+"""
+import asyncio
+import contextlib
+import importlib.util
+import logging
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse
+from KatamariUI import KatamariUI
+from KatamariLambda import KatamariLambdaFunction, KatamariLambdaManager, parse_time_string
+from KatamariDB import KatamariMVCC
+import aiohttp
+import orjson
+import xxhash
+
+# Frames at least this large are zlib-compressed once here and sent as-is to every
+# client, instead of each connection compressing them again with permessage-deflate
+COMPRESS_MIN_BYTES = 1024
+
+# Unchanged polls double the feed's poll interval, up to this many seconds
+MAX_POLL_INTERVAL = 60
+
+# aiohttp decodes Brotli responses only when the brotli package is installed
+ACCEPT_ENCODING = "gzip, deflate, br" if importlib.util.find_spec("brotli") else "gzip, deflate"
+# Datetimes in records are formatted by orjson as RFC 3339, naive ones taken as UTC
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def encode_frame(chunks: Iterable[bytes]) -> bytes:
+    """
+    Join serialized chunks into one frame, compressing it once it is large enough.
+
+    Chunks are fed to the compressor as they are produced, so a large frame never
+    exists uncompressed in full; zlib data starts with 0x78, JSON with '{'.
+    """
+    head = bytearray()
+    compressor = None
+    compressed = []
+    for chunk in chunks:
+        if compressor is not None:
+            compressed.append(compressor.compress(chunk))
+            continue
+        head += chunk
+        if len(head) >= COMPRESS_MIN_BYTES:
+            compressor = zlib.compressobj(6)
+            compressed.append(compressor.compress(head))
+    if compressor is None:
+        return bytes(head)
+    compressed.append(compressor.flush())
+    return b"".join(compressed)
+
+
+def _json_array(items: Iterable[Any]) -> Iterator[bytes]:
+    """Serialize a JSON array one element at a time."""
+    separator = b"["
+    for item in items:
+        yield separator
+        yield orjson.dumps(item, option=ORJSON_OPTIONS)
+        separator = b","
+    yield b"]" if separator == b"," else b"[]"
+
+
+class Broadcaster:
+    """Registry of connected WebSocket clients; each tick is sent to all of them at once."""
+
+    def __init__(self, send_timeout: float = 5.0):
+        # Client -> lock held for each send, so a client's frames never interleave and
+        # arrive in the order they were queued
+        self.clients: Dict[WebSocket, asyncio.Lock] = {}
+        self.send_timeout = send_timeout  # Clients slower than this are dropped
+
+    async def register(self, websocket: WebSocket, snapshot: Callable[[], bytes]):
+        """Accept a client and send it the current snapshot, then every later broadcast."""
+        await websocket.accept()
+        # Taking the snapshot and joining the registry with no await in between means every
+        # broadcast is either already in the snapshot or sent to this client after it
+        payload = snapshot()
+        lock = self.clients[websocket] = asyncio.Lock()
+        async with lock:
+            await websocket.send_bytes(payload)
+
+    def unregister(self, websocket: WebSocket):
+        """Stop sending to a client."""
+        self.clients.pop(websocket, None)
+
+    async def _send(self, websocket: WebSocket, lock: asyncio.Lock, payload: bytes):
+        """Send one frame once the client's earlier frames are out."""
+        async with lock:
+            await websocket.send_bytes(payload)
+
+    async def broadcast(self, payload: bytes):
+        """Send a payload to every client, dropping those that fail or time out."""
+        clients = list(self.clients.items())
+        results = await asyncio.gather(
+            *(asyncio.wait_for(self._send(ws, lock, payload), timeout=self.send_timeout) for ws, lock in clients),
+            return_exceptions=True
+        )
+        dropped = [websocket for (websocket, _), result in zip(clients, results) if isinstance(result, Exception)]
+        for websocket in dropped:
+            self.unregister(websocket)
+        if dropped:
+            await asyncio.gather(*(self._close(websocket) for websocket in dropped))
+
+    async def _close(self, websocket: WebSocket):
+        """Close a dropped client so its page sees the error instead of a frozen table.
+
+        A timed-out send may have been cancelled mid-frame, so the connection cannot be reused.
+        """
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(websocket.close(code=1011), timeout=self.send_timeout)
+
+
+class Tracker:
+    """Polls one feed, versions its records in KatamariMVCC and queues the changes for clients."""
+
+    def __init__(self, url: str, source: str, columns: Sequence[str], items: Callable[[Any], Sequence],
+                 key_fn: Callable[[Any], Any], record_builder: Callable[[Any], tuple],
+                 logger: logging.Logger):
+        self.url = url
+        self.source = source  # Feed name used in log messages
+        # Records are tuples in this column order; labels are sent once per snapshot, not per row
+        self.columns = (*columns, "Version")
+        self.items = items
+        self.key_fn = key_fn
+        self.record_builder = record_builder
+        self.logger = logger
+        self.db = KatamariMVCC()
+        self.broadcaster = Broadcaster()
+        self.session: Optional[aiohttp.ClientSession] = None  # Open while the app is running
+        self.latest: tuple[tuple, ...] = ()  # Rebound whole each tick, never mutated
+        self._versions: Dict[Any, int] = {}  # Version of the latest stored record for each key
+        # Changes accumulate until the broadcaster sends them, so a tick that lands
+        # before a broadcast is never lost
+        self._prev_by_key: Dict[Any, tuple] = {}  # Key -> latest record, as known to clients
+        self._pending_upserts: Dict[Any, tuple] = {}  # Key -> record changed since the last broadcast
+        self._pending_removes: set = set()  # Keys dropped from the feed since the last broadcast
+        self._snapshot_payload: Optional[bytes] = None  # Serialized snapshot, built on demand once per tick
+        self._last_body_hash: Optional[int] = None  # xxh3 of the last response body that was stored
+        self._update_event: Optional[asyncio.Event] = None
+        self.poll_function: Optional[KatamariLambdaFunction] = None  # Rescheduled as the feed goes quiet or busy
+        self.min_interval = 0  # Poll interval in seconds while the feed is changing
+        self.poll_interval = 0  # Poll interval in seconds right now
+
+    def _set_poll_interval(self, seconds: int):
+        """Reschedule the polling function.
+
+        The scheduler reads the schedule after every run, so a change made during a poll
+        sets the wait before the next one.
+        """
+        if seconds == self.poll_interval:
+            return
+        self.poll_interval = seconds
+        if self.poll_function is not None:
+            self.logger.info(f"Polling {self.source} every {seconds}s.")
+            self.poll_function.schedule = f"{seconds}s"
+
+    def get_update_event(self) -> asyncio.Event:
+        """Create the update event on first use, inside the server's running loop."""
+        if self._update_event is None:
+            self._update_event = asyncio.Event()
+        return self._update_event
+
+    def get_snapshot(self) -> bytes:
+        """Serialize the full current state once per tick, for newly connected clients."""
+        if self._snapshot_payload is None:
+            self._snapshot_payload = encode_frame(self._snapshot_chunks())
+        return self._snapshot_payload
+
+    def take_delta(self) -> bytes:
+        """Serialize the changes accumulated since the last broadcast and start a new batch."""
+        delta = encode_frame(self._delta_chunks())
+        self._pending_upserts, self._pending_removes = {}, set()
+        return delta
+
+    def _snapshot_chunks(self) -> Iterator[bytes]:
+        # {"columns": [...], "snapshot": [[key, record], ...]}, row by row
+        yield b'{"columns":'
+        yield orjson.dumps(self.columns)
+        yield b',"snapshot":'
+        yield from _json_array(self._prev_by_key.items())
+        yield b"}"
+
+    def _delta_chunks(self) -> Iterator[bytes]:
+        # {"upsert": [[key, record], ...], "remove": [key, ...]}, row by row
+        yield b'{"upsert":'
+        yield from _json_array(self._pending_upserts.items())
+        yield b',"remove":'
+        yield orjson.dumps(list(self._pending_removes))
+        yield b"}"
+
+    async def pull(self, event=None, context=None):
+        """Lambda function to fetch the feed and store its records using KatamariMVCC."""
+        self.logger.info(f"Fetching data from {self.source}... Remaining time: {context.get_remaining_time_in_millis()}ms")
+        tx_id = None
+        try:
+            async with self.session.get(self.url) as response:
+                response.raise_for_status()
+                raw = await response.read()
+
+            # Unchanged feeds are common; skip the transaction and per-record diff for them
+            body_hash = xxhash.xxh3_64_intdigest(raw)
+            if body_hash == self._last_body_hash:
+                self.logger.info("Upstream data unchanged; skipping update.")
+                # Back off while the feed is quiet, so idle polls track its real change rate
+                self._set_poll_interval(max(self.min_interval, min(self.poll_interval * 2, MAX_POLL_INTERVAL)))
+                return
+            self._set_poll_interval(self.min_interval)
+            items = self.items(orjson.loads(raw))
+
+            # Begin a new transaction
+            tx_id = self.db.begin_transaction()
+
+            new_data = []
+            new_by_key = {}
+            upserts = []  # (key, record) for records clients have not seen
+            keys = [self.key_fn(item) for item in items]
+            current = self.db.multi_get(keys, tx_id)
+            for key, item in zip(keys, items):
+                info = self.record_builder(item)
+
+                # Store a new version only when the record changed; stored records carry no
+                # Version column, so an unchanged record compares equal on the next tick
+                changed = current.get(key) != info
+                if changed:
+                    self._versions[key] = self.db.put(key, info, tx_id=tx_id)
+                record = (*info, self._versions[key])
+                new_data.append(record)
+                new_by_key[key] = record
+                if changed or key not in self._prev_by_key:
+                    upserts.append((key, record))
+
+            # Commit the transaction
+            self.db.commit(tx_id)
+            self._last_body_hash = body_hash
+            self.latest = tuple(new_data)  # Readers always see one complete tick
+            self._publish(new_by_key, upserts)
+            self.logger.info(f"Fetched and stored {len(self.latest)} records from {self.source}.")
+
+        except aiohttp.ClientError as e:
+            self.logger.error(f"Failed to fetch data from {self.source}: {e}")
+        except Exception as e:
+            if tx_id in self.db.transactions:
+                self.db.rollback(tx_id)
+            self.logger.error(f"Transaction failed: {e}")
+
+    def _publish(self, new_by_key: Dict[Any, tuple], upserts: list):
+        """Fold one tick's changes into the pending batch and wake the broadcaster."""
+        removed = self._prev_by_key.keys() - new_by_key.keys()
+        if not upserts and not removed:
+            # The body changed but no record did (e.g. only a feed timestamp moved): keep the
+            # cached snapshot and send nothing
+            self._prev_by_key = new_by_key
+            return
+        for key in removed:
+            self._pending_upserts.pop(key, None)
+            self._pending_removes.add(key)
+        for key, record in upserts:
+            self._pending_removes.discard(key)
+            self._pending_upserts[key] = record
+        self._prev_by_key = new_by_key
+        self._snapshot_payload = None
+        self.get_update_event().set()
+
+    async def broadcast_updates(self):
+        """Send each batch of changes to all clients; the only task that clears the update event."""
+        update_event = self.get_update_event()
+        while True:
+            await update_event.wait()
+            # Cleared before sending, so a tick that lands mid-broadcast is sent right after
+            update_event.clear()
+            await self.broadcaster.broadcast(self.take_delta())
+
+
+# Base styles for every tracker page; `extra_css` is appended after them
+_PAGE_CSS = """
+        body {
+            font-family: Arial, sans-serif;
+            margin: 0;
+            padding: 0;
+        }
+        table {
+            width: 100%;
+            max-width: 100%;
+            border-collapse: collapse;
+            margin: 0 auto;
+        }
+        th, td {
+            padding: 8px;
+            text-align: left;
+            border: 1px solid #ddd;
+        }
+        th {
+            background-color: #f4f4f4;
+            font-weight: bold;
+        }
+        tbody tr.highlight {
+            background-color: #FFFF99;
+            transition: background-color 2s ease;
+        }
+"""
+
+# Applies the snapshot and delta messages sent over the WebSocket to the page's table
+_PAGE_SCRIPT = """
+    <script>
+        const decoder = new TextDecoder();
+        let received = Promise.resolve();  // Chains decoding so messages apply in arrival order
+        let rows = new Map();  // Record key -> table row
+
+        function renderRow(row, record) {
+            row.innerHTML = "";
+            record.forEach(value => {
+                let cell = row.insertCell();
+                cell.textContent = value !== null ? value : "N/A";
+            });
+        }
+
+        function renderHeader(table, columns) {
+            if (table.tHead) table.deleteTHead();
+            let header = table.createTHead().insertRow();
+            columns.forEach(name => {
+                let th = document.createElement("th");
+                th.textContent = name;
+                header.appendChild(th);
+            });
+        }
+
+        // Frames are UTF-8 JSON, zlib-compressed by the server when large
+        async function decodeFrame(buffer) {
+            if (new Uint8Array(buffer)[0] !== 0x78) return decoder.decode(buffer);
+            const stream = new Blob([buffer]).stream().pipeThrough(new DecompressionStream("deflate"));
+            return await new Response(stream).text();
+        }
+
+        function connect() {
+            let socket = new WebSocket("ws://localhost:8000/ws");
+            socket.binaryType = "arraybuffer";
+            socket.onmessage = function(event) {
+                received = received
+                    .then(() => decodeFrame(event.data))
+                    .then(text => applyMessage(JSON.parse(text)))
+                    .catch(error => console.error("Failed to apply update:", error));
+            };
+            // The server closes clients it has dropped; reconnect for a fresh snapshot
+            socket.onclose = function(event) {
+                console.warn("Update stream closed:", event.code);
+                setTimeout(connect, 1000);
+            };
+        }
+
+        function applyMessage(message) {
+            let table = document.querySelector("table");
+            let tbody = table.tBodies[0] || table.createTBody();
+
+            if (message.snapshot) {
+                // Full state on connect; every later message only carries changes
+                renderHeader(table, message.columns);
+                tbody.innerHTML = "";
+                rows.clear();
+                message.snapshot.forEach(([key, record]) => {
+                    let row = tbody.insertRow();
+                    renderRow(row, record);
+                    rows.set(key, row);
+                });
+                return;
+            }
+
+            message.remove.forEach(key => {
+                let row = rows.get(key);
+                if (row) {
+                    row.remove();
+                    rows.delete(key);
+                }
+            });
+            message.upsert.forEach(([key, record]) => {
+                let row = rows.get(key);
+                if (row) {
+                    // Highlight updated rows and move them to the top
+                    renderRow(row, record);
+                    row.classList.add("highlight");
+                    setTimeout(() => { row.classList.remove("highlight"); }, 2000);
+                    tbody.prepend(row);
+                } else {
+                    row = tbody.insertRow();
+                    renderRow(row, record);
+                    rows.set(key, row);
+                }
+            });
+        }
+
+        connect();
+    </script>
+    """
+
+
+async def _render_page(title: str, header: str, table_header: str, nav_label: str,
+                       columns: Sequence[str], extra_css: str) -> bytes:
+    """
+    Render the tracker page once, with the table's header row and an empty body.
+
+    The page script replaces the table body with the snapshot sent on connect, so
+    rows rendered here would be thrown away; responsive styles and the WebSocket
+    JavaScript follow the template.
+    """
+    ui_instance = KatamariUI(title=title, header=header)
+    ui_instance.configure_navbar([
+        {"label": nav_label, "link": "/"}
+    ])
+    await ui_instance.add_header(table_header, level=2)
+    header_row = "".join(f"<th>{column}</th>" for column in columns)
+    await ui_instance.raw_html(f"<table class='table table-bordered'><thead><tr>{header_row}</tr></thead><tbody></tbody></table>")
+    html_content = await ui_instance.generate_template()
+    return html_content.encode() + f"""
+    <style>{_PAGE_CSS}{extra_css}    </style>{_PAGE_SCRIPT}""".encode()
+
+
+def make_tracker_app(*, title: str, header: str, nav_label: str, url: str, source: str,
+                     columns: Sequence[str], record_builder: Callable[[Any], tuple],
+                     key_fn: Callable[[Any], Any],
+                     schedule: str, lambda_name: str, items: Callable[[Any], Sequence] = lambda data: data,
+                     environment: Optional[dict] = None, table_header: Optional[str] = None,
+                     extra_css: str = "", logger_name: str = "KatamariTracker") -> FastAPI:
+    """
+    Build a tracker app for one upstream JSON feed.
+
+    Args:
+        title (str): Page title.
+        header (str): Page header.
+        nav_label (str): Navbar label of the tracker page.
+        url (str): Feed URL, fetched on every tick.
+        source (str): Feed name used in log messages.
+        columns (Sequence[str]): Column labels, in the order of the record tuples.
+        record_builder (Callable[[Any], tuple]): Maps one feed item to a table row tuple.
+        key_fn (Callable[[Any], Any]): Returns the stable key of one feed item.
+        schedule (str): KatamariLambda schedule for polling the feed, e.g. "6s"; the interval
+            doubles on each unchanged poll, up to MAX_POLL_INTERVAL seconds.
+        lambda_name (str): Name of the polling Lambda function.
+        items (Callable[[Any], Sequence]): Extracts the items from the decoded response.
+        environment (Optional[dict]): Environment of the Lambda function.
+        table_header (Optional[str]): Header above the table; defaults to `header`.
+        extra_css (str): CSS rules added after the base page styles.
+        logger_name (str): Name of the app's logger.
+
+    Returns:
+        FastAPI: The app, with its Tracker available as `app.state.tracker` and, while
+        running, its HTTP session as `app.state.http`.
+    """
+    tracker = Tracker(url, source, columns, items, key_fn, record_builder, logging.getLogger(logger_name))
+    page = b""  # Static page shell, rendered once at startup; rows arrive over the WebSocket
+
+    tracker.poll_function = KatamariLambdaFunction(
+        name=lambda_name,
+        handler=tracker.pull,
+        schedule=schedule,
+        environment=environment,
+        timeout_seconds=240,
+        memory_limit=256,
+        concurrency_limit=2
+    )
+    tracker.min_interval = tracker.poll_interval = parse_time_string(schedule)
+    lambda_manager = KatamariLambdaManager([tracker.poll_function])
+
+    app = FastAPI()
+    app.state.tracker = tracker
+
+    @app.on_event("startup")
+    async def start_tracker():
+        nonlocal page
+        page = await _render_page(title, header, table_header or header, nav_label, tracker.columns, extra_css)
+        # One session for every tick: the feed's connection stays open between polls,
+        # so there is no new TCP and TLS handshake per tick, and bodies arrive compressed
+        tracker.session = app.state.http = aiohttp.ClientSession(
+            headers={"Accept-Encoding": ACCEPT_ENCODING},
+            connector=aiohttp.TCPConnector(limit=10, ttl_dns_cache=300, keepalive_timeout=300)
+        )
+        asyncio.create_task(lambda_manager.schedule_functions())
+        asyncio.create_task(tracker.broadcast_updates())
+
+    @app.on_event("shutdown")
+    async def stop_tracker():
+        await tracker.session.close()
+
+    # Root route to load the tracker page
+    @app.get("/", response_class=HTMLResponse)
+    async def get():
+        return HTMLResponse(content=page)
+
+    # WebSocket endpoint to send data changes after each tick
+    @app.websocket("/ws")
+    async def websocket_endpoint(websocket: WebSocket):
+        try:
+            await tracker.broadcaster.register(websocket, tracker.get_snapshot)
+            while True:
+                await websocket.receive_text()  # Park until the client disconnects
+        except WebSocketDisconnect:
+            pass
+        finally:
+            tracker.broadcaster.unregister(websocket)
+
+    return app
+
+
+def run(app: FastAPI):
+    """Serve a tracker app locally."""
+    import uvicorn
+    # libuv's event loop and the C HTTP parser cut the cost of every send and scheduled wakeup;
+    # both are optional (uvloop is not available on Windows), so fall back to the pure-Python ones
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    # Frames are compressed once by the app, so per-connection deflate would only repeat the work
+    uvicorn.run(app, host="127.0.0.1", port=8000, loop=loop, http=http, ws="websockets",
+                ws_per_message_deflate=False)
@@ -34,8 +34,11 @@ setup(
         "argon2-cffi",
         "cryptography",
         "requests",
+        "aiohttp",
+        "xxhash",
         "dateutil",
-        "websockets"
+        "websockets",
+        "uvloop; sys_platform != 'win32'"
     ],
     python_requires=">=3.11",
     classifiers=[
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the SDK as the `KatamariSDK` package, as its modules import each other
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from cachetools import LRUCache
+from whoosh.fields import UnknownFieldError
+
+from KatamariSDK.KatamariSearch import KatamariSearch
+
+SCHEMA = {"body": "TEXT", "version": "NUMERIC"}
+
+
+def test_search_results_keep_stored_fields(tmp_path):
+    search = KatamariSearch(SCHEMA, index_dir=str(tmp_path))
+    try:
+        search._index_document("a", {"body": "hello world"}, 1, time.time() - 10)
+        results = asyncio.run(search.search("hello", time.time(), ["body"]))
+        assert [result["id"] for result in results] == ["a"]
+        assert results[0]["body"] == "hello world"
+    finally:
+        search.close()
+
+
+def test_search_hides_documents_newer_than_the_transaction(tmp_path):
+    search = KatamariSearch(SCHEMA, index_dir=str(tmp_path))
+    try:
+        search._index_document("old", {"body": "hello"}, 1, time.time() - 100)
+        search._index_document("new", {"body": "hello"}, 1, time.time())
+        results = asyncio.run(search.search("hello", time.time() - 50, ["body"]))
+        assert [result["id"] for result in results] == ["old"]
+    finally:
+        search.close()
+
+
+def test_relative_date_queries_are_parsed_on_every_search(tmp_path):
+    search = KatamariSearch({"body": "TEXT", "when": "DATETIME"}, index_dir=str(tmp_path))
+    try:
+        parser = search._get_parser(("body", "when"))
+        calls = []
+        original_parse = parser.parse
+        parser.parse = lambda text: calls.append(text) or original_parse(text)
+        for _ in range(2):
+            search._parse(("body", "when"), "when:today")
+            search._parse(("body", "when"), "hello")
+        # "hello" is parsed once and cached; "when:today" depends on the current date
+        assert calls == ["when:today", "hello", "when:today"]
+    finally:
+        search.close()
+
+
+def test_batches_release_the_index_lock_between_commits(tmp_path):
+    first = KatamariSearch(SCHEMA, index_dir=str(tmp_path))
+    second = KatamariSearch(SCHEMA, index_dir=str(tmp_path))
+    try:
+        first._index_document("a", {"body": "hello"}, 1, time.time() - 10)
+        first.flush()
+        second._index_document("b", {"body": "hello"}, 1, time.time() - 10)
+        second.flush()
+        results = asyncio.run(first.search("hello", time.time(), ["body"]))
+        assert sorted(result["id"] for result in results) == ["a", "b"]
+    finally:
+        first.close()
+        second.close()
+
+
+def test_batches_commit_on_limit_and_period_but_not_when_idle(tmp_path):
+    search = KatamariSearch(SCHEMA, index_dir=str(tmp_path), commit_period=0.1, commit_limit=2)
+    try:
+        generation = search.index.latest_generation()
+        search._index_document("a", {"body": "hello"}, 1, time.time())
+        search._index_document("b", {"body": "hello"}, 1, time.time())
+        assert search.index.latest_generation() == generation + 1  # Limit reached
+        search._index_document("c", {"body": "hello"}, 1, time.time())
+        time.sleep(0.5)
+        assert search.index.latest_generation() == generation + 2  # Period elapsed
+        time.sleep(0.3)
+        assert search.index.latest_generation() == generation + 2  # Nothing buffered
+    finally:
+        search.close()
+
+
+def test_rejected_documents_do_not_block_the_batch(tmp_path):
+    search = KatamariSearch(SCHEMA, index_dir=str(tmp_path))
+    try:
+        with pytest.raises(UnknownFieldError):
+            search._index_document("unknown", {"body": "hello", "nosuch": 1}, 1, time.time() - 10)
+        search._index_document("bad", {"body": "hello"}, "not a number", time.time() - 10)
+        search._index_document("good", {"body": "hello"}, 1, time.time() - 10)
+        for _ in range(2):
+            results = asyncio.run(search.search("hello", time.time(), ["body"]))
+            assert [result["id"] for result in results] == ["good"]
+        assert not search._writer.has_pending()
+    finally:
+        search.close()
+
+
+def test_unclosed_index_commits_and_exits(tmp_path):
+    script = (
+        "import time\n"
+        "from KatamariSDK.KatamariSearch import KatamariSearch\n"
+        f"search = KatamariSearch({SCHEMA!r}, index_dir={str(tmp_path)!r}, commit_period=60)\n"
+        "search._index_document('a', {'body': 'hello'}, 1, time.time() - 10)\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", script], cwd=root, check=True, timeout=30)
+    search = KatamariSearch(SCHEMA, index_dir=str(tmp_path))
+    try:
+        results = asyncio.run(search.search("hello", time.time(), ["body"]))
+        assert [result["id"] for result in results] == ["a"]
+    finally:
+        search.close()
+
+
+def test_query_cache_is_safe_across_search_threads(tmp_path):
+    search = KatamariSearch(SCHEMA, index_dir=str(tmp_path))
+    search._query_cache = LRUCache(maxsize=4)  # Small, so threads keep evicting each other's entries
+    errors = []
+
+    def parse_many(worker):
+        try:
+            for i in range(2000):
+                search._parse(("body",), f"w{(worker + i) % 8}")
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads often, so unguarded cache updates interleave
+    try:
+        threads = [threading.Thread(target=parse_many, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+    finally:
+        sys.setswitchinterval(interval)
+        search.close()
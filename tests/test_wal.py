@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+import pytest
+
+from KatamariSDK.KatamariFailover import SegmentWriter, WALManager
+
+
+def _segment(log_dir):
+    (name,) = [name for name in os.listdir(log_dir) if name.endswith(".log")]
+    return os.path.join(log_dir, name)
+
+
+def test_recovery_keeps_records_written_after_a_torn_tail(tmp_path):
+    log_dir = str(tmp_path)
+
+    async def write(transaction_id, data):
+        wal = WALManager(log_dir, shards=1)
+        await wal.write_log(transaction_id, data, durability="every")
+        await wal.close()
+
+    asyncio.run(write("a", {"value": 1}))
+    with open(_segment(log_dir), "ab") as segment:
+        segment.write(b"\x00\x01\x02")  # A record torn by a crash
+    asyncio.run(write("b", {"value": 2}))
+
+    async def read():
+        wal = WALManager(log_dir, shards=1)
+        try:
+            return wal.read_log("a"), wal.read_log("b")
+        finally:
+            await wal.close()
+
+    assert asyncio.run(read()) == ({"value": 1}, {"value": 2})
+
+
+def test_failed_append_leaves_no_partial_record(tmp_path, monkeypatch):
+    writer = SegmentWriter(str(tmp_path))
+    writer.open(1)
+    writer.append(memoryview(b"first"), 1)
+
+    real_write = os.write
+
+    def short_write(fd, data):
+        real_write(fd, bytes(data[:2]))
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "write", short_write)
+    with pytest.raises(OSError):
+        writer.append(memoryview(b"second"), 2)
+    monkeypatch.undo()
+    writer.append(memoryview(b"third"), 3)
+    writer.close()
+
+    with open(writer.path, "rb") as segment:
+        assert segment.read() == b"firstthird"